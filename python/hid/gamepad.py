@@ -2,12 +2,12 @@
 
 import json
 import os
-from collections import deque
+import time
 from dataclasses import dataclass
-from threading import Thread
+from threading import Event, Thread
 
-import numpy as np
 import pygame
+from utils.sliding_median import SlidingMedian
 
 
 @dataclass
@@ -90,6 +90,33 @@ def interpolate(start, end, percent):
     return start + percent * (end - start)
 
 
+def curve_coefficients(cfg: AxisConfig) -> tuple:
+    """precompute the constants used to map raw joystick input to an output for one axis
+
+    arguments
+    cfg -- configuration of the axis
+
+    return tuple of (sign, deadband, slope, shift, min, max) followed by slope, shift, min, max for reverse
+    """
+    slope_fwd = (cfg.max_forward_dir - cfg.min_forward_dir) / (1.0 - cfg.deadband)
+    shift_fwd = cfg.max_forward_dir - slope_fwd
+    slope_rev = (cfg.max_reverse_dir - cfg.min_reverse_dir) / (1.0 - cfg.deadband)
+    shift_rev = cfg.max_reverse_dir - slope_rev
+    sign = -1.0 if cfg.inverted else 1.0
+    return (
+        sign,
+        cfg.deadband,
+        slope_fwd,
+        shift_fwd,
+        cfg.min_forward_dir,
+        cfg.max_forward_dir,
+        slope_rev,
+        shift_rev,
+        cfg.min_reverse_dir,
+        cfg.max_reverse_dir,
+    )
+
+
 def joystick_connected():
     if not pygame.get_init():
         pygame.init()
@@ -111,64 +138,69 @@ class Gamepad:
         self.y_vel = 0
         self.yaw = 0
         self.joystick = pygame.joystick.Joystick(0)
-        self._stopping = False
+        self._stop_event = Event()
         self._listening_thread = None
         self._config = config
 
         buffer_length = config.median_filter_window
-        self._x_buffer = deque([0] * buffer_length, buffer_length)
-        self._y_buffer = deque([0] * buffer_length, buffer_length)
-        self._yaw_buffer = deque([0] * buffer_length, buffer_length)
+        self._x_filter = SlidingMedian(buffer_length)
+        self._y_filter = SlidingMedian(buffer_length)
+        self._yaw_filter = SlidingMedian(buffer_length)
+
+        # configuration is fixed so the curve for each axis only needs to be computed once
+        self._x_curve = curve_coefficients(config.x_axis_config)
+        self._y_curve = curve_coefficients(config.y_axis_config)
+        self._yaw_curve = curve_coefficients(config.yaw_axis_config)
 
         print(f"[INFO] Initialized {self.joystick.get_name()}")
         print(f"[INFO] Joystick power level {self.joystick.get_power_level()}")
 
-    def _apply_curve(self, value: float, cfg: AxisConfig):
-        if cfg.inverted:
-            value = -value
+    def _apply_curve(self, value: float, curve: tuple):
+        sign, deadband, slope_fwd, shift_fwd, min_fwd, max_fwd, slope_rev, shift_rev, min_rev, max_rev = curve
+        value *= sign
 
-        if abs(value) < cfg.deadband:
+        if abs(value) < deadband:
             return 0
         elif value > 0:
-            slope = (cfg.max_forward_dir - cfg.min_forward_dir) / (1.0 - cfg.deadband)
-            shift = cfg.max_forward_dir - slope
-            value = slope * value + shift
-            return np.clip(value, cfg.min_forward_dir, cfg.max_forward_dir)
+            value = slope_fwd * value + shift_fwd
+            return max_fwd if value > max_fwd else (min_fwd if value < min_fwd else value)
         else:
-            slope = (cfg.max_reverse_dir - cfg.min_reverse_dir) / (1.0 - cfg.deadband)
-            shift = cfg.max_reverse_dir - slope
-            value = slope * value + shift
-            return np.clip(value, -cfg.max_reverse_dir, -cfg.min_reverse_dir)
+            value = slope_rev * value + shift_rev
+            return -min_rev if value > -min_rev else (-max_rev if value < -max_rev else value)
 
     def start_listening(self):
         self._listening_thread = Thread(target=self.listen)
         self._listening_thread.start()
 
     def listen(self):
-        while not self._stopping:
+        deadline = time.monotonic()
+        while not self._stop_event.is_set():
             # Handle events
             pygame.event.pump()
             x_input = self.joystick.get_axis(self._config.x_axis_config.index)
             y_input = self.joystick.get_axis(self._config.y_axis_config.index)
             yaw_input = self.joystick.get_axis(self._config.yaw_axis_config.index)
 
-            x_vel = self._apply_curve(x_input, self._config.x_axis_config)
-            y_vel = self._apply_curve(y_input, self._config.y_axis_config)
-            yaw = self._apply_curve(yaw_input, self._config.yaw_axis_config)
-
-            self._x_buffer.append(x_vel)
-            self._y_buffer.append(y_vel)
-            self._yaw_buffer.append(yaw)
+            x_vel = self._apply_curve(x_input, self._x_curve)
+            y_vel = self._apply_curve(y_input, self._y_curve)
+            yaw = self._apply_curve(yaw_input, self._yaw_curve)
 
-            self.x_vel = np.median(self._x_buffer)
-            self.y_vel = np.median(self._y_buffer)
-            self.yaw = np.median(self._yaw_buffer)
+            self.x_vel = self._x_filter.push(x_vel)
+            self.y_vel = self._y_filter.push(y_vel)
+            self.yaw = self._yaw_filter.push(yaw)
 
             self._context.velocity_cmd = [self.x_vel, self.y_vel, self.yaw]
             # update inputs at 100hz this should mean we always have a new data for the 50Hz command update
-            pygame.time.wait(10)
+            # sleep until an absolute deadline so time spent polling does not slow the loop down
+            deadline += 0.01
+            sleep_time = deadline - time.monotonic()
+            if sleep_time > 0:
+                # waiting on the stop event lets stop_listening interrupt the sleep
+                self._stop_event.wait(sleep_time)
+            else:
+                deadline = time.monotonic()
 
     def stop_listening(self):
         if self._listening_thread is not None:
-            self._stopping = True
+            self._stop_event.set()
             self._listening_thread.join()
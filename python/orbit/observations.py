@@ -1,100 +1,103 @@
 # Copyright (c) 2024 Boston Dynamics AI Institute LLC. All rights reserved.
 
-from operator import sub
+import math
 
+import numpy as np
 from bosdyn.api import robot_state_pb2
 from orbit.orbit_configuration import OrbitConfig
-from orbit.orbit_constants import ordered_joint_names_orbit
-from spatialmath import UnitQuaternion
-from spot.constants import ordered_joint_names_bosdyn
-from utils.dict_tools import dict_to_list, find_ordering, reorder
+from orbit.orbit_constants import spot_to_orbit_ordering
+from utils.dict_tools import reorder_np
 
 
-def get_base_linear_velocity(state: robot_state_pb2.RobotStateStreamResponse):
+def get_base_rotation(state: robot_state_pb2.RobotStateStreamResponse) -> np.ndarray:
+    """calculate the rotation from spots odom frame to its base frame. this is the
+    inverse of the estimated orientation of the base so it can be computed once per
+    state update and reused for every vector that needs to be moved into the base frame
+
+    arguments
+    state -- proto msg from spot containing data on the robots state
+
+    return 3x3 rotation matrix base_R_odom
+    """
+    q = state.kinematic_state.odom_tform_body.rotation
+    norm = math.sqrt(q.w * q.w + q.x * q.x + q.y * q.y + q.z * q.z)
+    w, x, y, z = q.w / norm, q.x / norm, q.y / norm, q.z / norm
+
+    # transpose of the rotation matrix for quaternion odom_R_base
+    return np.array(
+        [
+            [1 - 2 * (y * y + z * z), 2 * (x * y + w * z), 2 * (x * z - w * y)],
+            [2 * (x * y - w * z), 1 - 2 * (x * x + z * z), 2 * (y * z + w * x)],
+            [2 * (x * z + w * y), 2 * (y * z - w * x), 1 - 2 * (x * x + y * y)],
+        ]
+    )
+
+
+def get_base_linear_velocity(state: robot_state_pb2.RobotStateStreamResponse, base_r_odom: np.ndarray, out: np.ndarray):
     """calculate linear velocity of spots base in the base frame from data
     available in spots state update.  note spot gives velocity in odom frame
     so we need to rotate it to current estimated pose of the base
 
     arguments
     state -- proto msg from spot containing data on the robots state
+    base_r_odom -- rotation matrix from get_base_rotation for this state
+    out -- array view of length 3 the result is written into
     """
     msg = state.kinematic_state.velocity_of_body_in_odom.linear
+    out[:] = base_r_odom @ (msg.x, msg.y, msg.z)
 
-    odom_r_base_msg = state.kinematic_state.odom_tform_body.rotation
-    scalar = odom_r_base_msg.w
-    vector = [odom_r_base_msg.x, odom_r_base_msg.y, odom_r_base_msg.z]
-    odom_r_base = UnitQuaternion(scalar, vector)
-
-    velocity_odom = [msg.x, msg.y, msg.z]
-    velocity_base = odom_r_base.inv() * velocity_odom
 
-    return velocity_base.tolist()
-
-
-def get_base_angular_velocity(state: robot_state_pb2.RobotStateStreamResponse):
+def get_base_angular_velocity(
+    state: robot_state_pb2.RobotStateStreamResponse, base_r_odom: np.ndarray, out: np.ndarray
+):
     """calculate angular velocity of spots base in the base frame from data
     available in spots state update.  note spot gives velocity in odom frame
     so we need to rotate it to current estimated pose of the base
 
     arguments
     state -- proto msg from spot containing data on the robots state
+    base_r_odom -- rotation matrix from get_base_rotation for this state
+    out -- array view of length 3 the result is written into
     """
     msg = state.kinematic_state.velocity_of_body_in_odom.angular
-
-    odom_r_base_msg = state.kinematic_state.odom_tform_body.rotation
-    scalar = odom_r_base_msg.w
-    vector = [odom_r_base_msg.x, odom_r_base_msg.y, odom_r_base_msg.z]
-    odom_r_base = UnitQuaternion(scalar, vector)
-
-    angular_velocity_odom = [msg.x, msg.y, msg.z]
-    angular_velocity_base = odom_r_base.inv() * angular_velocity_odom
-
-    return angular_velocity_base.tolist()
+    out[:] = base_r_odom @ (msg.x, msg.y, msg.z)
 
 
-def get_projected_gravity(state: robot_state_pb2.RobotStateStreamResponse):
+def get_projected_gravity(state: robot_state_pb2.RobotStateStreamResponse, base_r_odom: np.ndarray, out: np.ndarray):
     """calculate direction of gravity in spots base frame
         the assumption here is that the odom frame Z axis is opposite gravity
         this is the case if spots body is parallel to the floor when turned on
 
     arguments
     state -- proto msg from spot containing data on the robots state
+    base_r_odom -- rotation matrix from get_base_rotation for this state
+    out -- array view of length 3 the result is written into
     """
-    odom_r_base_msg = state.kinematic_state.odom_tform_body.rotation
+    # gravity is -z in odom so in the base frame it is the negated last column of base_R_odom
+    out[:] = -base_r_odom[:, 2]
 
-    scalar = odom_r_base_msg.w
-    vector = [odom_r_base_msg.x, odom_r_base_msg.y, odom_r_base_msg.z]
-    odom_r_base = UnitQuaternion(scalar, vector)
 
-    gravity_odom = [0, 0, -1]
-    gravity_base = odom_r_base.inv() * gravity_odom
-    return gravity_base.tolist()
-
-
-def get_joint_positions(state: robot_state_pb2.RobotStateStreamResponse, config: OrbitConfig):
+def get_joint_positions(joint_positions: np.ndarray, config: OrbitConfig, out: np.ndarray):
     """get joint position from spots state update a reformat for orbit by
     reordering to match orbits expectation and shifting so 0 position is the
     same as was used in training
 
     arguments
-    state -- proto msg from spot containing data on the robots state
+    joint_positions -- array of spots leg joint positions read from its state update
     config -- dataclass with values loaded from orbits training data
+    out -- array view of length 12 the result is written into
     """
 
-    spot_to_orbit = find_ordering(ordered_joint_names_bosdyn, ordered_joint_names_orbit)
-    pos = reorder(state.joint_states.position, spot_to_orbit)
-    default_joints = dict_to_list(config.default_joints, ordered_joint_names_orbit)
-    pos = list(map(sub, pos, default_joints))
-    return pos
+    reorder_np(joint_positions, spot_to_orbit_ordering, out=out)
+    out -= config.default_joints_orbit
 
 
-def get_joint_velocity(state: robot_state_pb2.RobotStateStreamResponse):
+def get_joint_velocity(joint_velocities: np.ndarray, out: np.ndarray):
     """get joint velocity from spots state update a reformat for orbit by
     reordering to match orbits expectation
 
     arguments
-    state -- proto msg from spot containing data on the robots state
+    joint_velocities -- array of spots leg joint velocities read from its state update
+    out -- array view of length 12 the result is written into
     """
-    spot_to_orbit = find_ordering(ordered_joint_names_bosdyn, ordered_joint_names_orbit)
-    vel = reorder(state.joint_states.velocity, spot_to_orbit)
-    return vel
+    reorder_np(joint_velocities, spot_to_orbit_ordering, out=out)
@@ -2,8 +2,6 @@
 
 import os
 from dataclasses import dataclass
-from operator import add, mul
-from threading import Event
 from typing import List
 
 import numpy as np
@@ -14,16 +12,20 @@ from bosdyn.api.robot_command_pb2 import JointControlStreamRequest
 from bosdyn.api.robot_state_pb2 import RobotStateStreamResponse
 from bosdyn.util import seconds_to_timestamp, set_timestamp_from_now, timestamp_to_sec
 from orbit.orbit_configuration import OrbitConfig
-from orbit.orbit_constants import ordered_joint_names_orbit
-from spot.constants import DEFAULT_K_Q_P, DEFAULT_K_QD_P, ordered_joint_names_bosdyn
-from utils.dict_tools import dict_to_list, find_ordering, reorder
+from orbit.orbit_constants import orbit_to_spot_ordering
+from spot.constants import DEFAULT_K_Q_P, DEFAULT_K_QD_P
+from utils.dict_tools import reorder_np
+from utils.event_divider import EventDivider
+
+_ZERO_JOINTS = (0.0,) * 12
+
 
 @dataclass
 class OnnxControllerContext:
     """data class to hold runtime data needed by the controller"""
 
-    event = Event()
     latest_state = None
+    state_updates = 0
     velocity_cmd = [0, 0, 0]
     count = 0
 
@@ -33,8 +35,14 @@ class StateHandler:
     into the controllers context
     """
 
-    def __init__(self, context: OnnxControllerContext) -> None:
+    def __init__(self, context: OnnxControllerContext, timing_policy: EventDivider) -> None:
+        """
+        arguments
+        context -- controller context the latest state is stored in
+        timing_policy -- divider ticked on every state update to pace the command stream
+        """
         self._context = context
+        self._timing_policy = timing_policy
 
     def __call__(self, state: RobotStateStreamResponse):
         """make class a callable and handle incoming state stream when called
@@ -42,7 +50,8 @@ class StateHandler:
         arguments
         state -- proto msg from spot containing most recent data on the robots state"""
         self._context.latest_state = state
-        self._context.event.set()
+        self._context.state_updates += 1
+        self._timing_policy.tick()
 
 
 def print_observations(observations: List[float]):
@@ -68,50 +77,118 @@ class OnnxCommandGenerator:
     ):
         self._context = context
         self._config = config
-        self._inference_session = ort.InferenceSession(policy_file_name)
-        self._last_action = [0] * 12
+
+        # the policy is tiny so a single thread with no arena gives the most consistent latency
+        session_options = ort.SessionOptions()
+        session_options.intra_op_num_threads = 1
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.enable_cpu_mem_arena = False
+        self._inference_session = ort.InferenceSession(
+            policy_file_name, sess_options=session_options, providers=["CPUExecutionProvider"]
+        )
         self._count = 1
+        self._ramp_done = False
         self._init_pos = None
         self._init_load = None
+        self._last_state_update = 0
         self.verbose = verbose
 
+        # observations and actions are written into these buffers every tick rather than reallocated
+        self._obs = np.zeros((1, 48), dtype=np.float32)
+
+        # named views into the observation buffer, filling these fills the model input
+        self._obs_base_linear_velocity = self._obs[0, 0:3]
+        self._obs_base_angular_velocity = self._obs[0, 3:6]
+        self._obs_projected_gravity = self._obs[0, 6:9]
+        self._obs_velocity_cmd = self._obs[0, 9:12]
+        self._obs_joint_positions = self._obs[0, 12:24]
+        self._obs_joint_velocity = self._obs[0, 24:36]
+        self._obs_last_action = self._obs[0, 36:48]
+
+        self._out = np.zeros((1, 12), dtype=np.float32)
+        self._action = np.zeros(12, dtype=np.float64)
+        self._pos_cmd = np.zeros(12, dtype=np.float64)
+
+        # look up the tensor names from the model once rather than passing them on every run
+        self._input_name = self._inference_session.get_inputs()[0].name
+        self._output_name = self._inference_session.get_outputs()[0].name
+
+        # bind the buffers to the session once so running the model does no tensor allocation
+        self._io_binding = self._inference_session.io_binding()
+        self._io_binding.bind_input(
+            name=self._input_name,
+            device_type="cpu",
+            device_id=0,
+            element_type=np.float32,
+            shape=self._obs.shape,
+            buffer_ptr=self._obs.ctypes.data,
+        )
+        self._io_binding.bind_output(
+            name=self._output_name,
+            device_type="cpu",
+            device_id=0,
+            element_type=np.float32,
+            shape=self._out.shape,
+            buffer_ptr=self._out.ctypes.data,
+        )
+
+        # run the policy once on the zeroed observation so the first control tick does not pay
+        # for any lazy initialization in the session, the output is overwritten on the next run
+        self._inference_session.run_with_iobinding(self._io_binding)
+
+        # command messages are updated in place each tick rather than reallocated
+        self._update_proto = self._create_stream_request()
+        self._hold_proto = self._create_stream_request()
+
     def __call__(self):
         """makes class a callable and computes model output for latest controller context
 
         return proto message to be used in spots command stream
         """
 
+        # the state thread replaces latest_state with a new message on every update, reading the
+        # reference once gives a consistent snapshot for the whole tick without any locking
+        state = self._context.latest_state
+        if self.verbose and self._context.state_updates == self._last_state_update:
+            print("[WARN] no new state since last command")
+        self._last_state_update = self._context.state_updates
+
         # cache initial joint position when command stream starts
         if self._init_pos is None:
-            self._init_pos = self._context.latest_state.joint_states.position
-            self._init_load = self._context.latest_state.joint_states.load
+            self._init_pos = state.joint_states.position[0:12]
+            self._init_load = state.joint_states.load[0:12]
 
         # extract observation data from latest spot state data
-        input_list = self.collect_inputs(self._context.latest_state, self._config)
-        # print("observations", input_list)
+        observations = self.collect_inputs(state, self._config)
+        # print_observations(observations)
 
         # execute model from onnx file
-        input = [np.array(input_list).astype("float32")]
-        output = self._inference_session.run(None, {"obs": input})[0].tolist()[0]
+        self._inference_session.run_with_iobinding(self._io_binding)
+        output = self._out[0]
 
         # post process model output apply action scaling and return to spots
         # joint order and offset
-        test_scale = min(0.1 * self._count, 1)
-
-        scaled_output = list(map(mul, [self._config.action_scale] * 12, output))
-        test_scaled = list(map(mul, [test_scale] * 12, scaled_output))
-
-        default_joints = dict_to_list(self._config.default_joints, ordered_joint_names_orbit)
-        shifted_output = list(map(add, test_scaled, default_joints))
-
-        orbit_to_spot = find_ordering(ordered_joint_names_orbit, ordered_joint_names_bosdyn)
-        reordered_output = reorder(shifted_output, orbit_to_spot)
+        # actions are ramped up over the first 10 ticks, after which the scale is constant
+        if self._ramp_done:
+            action_scale = self._config.action_scale
+        else:
+            test_scale = 0.1 * self._count
+            if test_scale >= 1:
+                test_scale = 1.0
+                self._ramp_done = True
+            action_scale = self._config.action_scale * test_scale
+
+        np.multiply(output, action_scale, out=self._action)
+        np.add(self._action, self._config.default_joints_orbit, out=self._action)
+        reorder_np(self._action, orbit_to_spot_ordering, out=self._pos_cmd)
 
         # generate proto message from target joint positions
-        proto = self.create_proto(reordered_output)
+        proto = self.create_proto(self._pos_cmd, state)
+
+        # the raw output is the last action observation for the next tick
+        self._obs_last_action[:] = output
 
         # cache data for history and logging
-        self._last_action = output
         self._count += 1
         self._context.count += 1
 
@@ -124,104 +201,97 @@ class OnnxCommandGenerator:
         state -- proto msg with spots latest state
         config -- model configuration data from orbit
 
-        return list of float values ready to be passed into the model
+        return float32 array of observations ready to be passed into the model
         """
-        observations = []
-        observations += ob.get_base_linear_velocity(state)
-        observations += ob.get_base_angular_velocity(state)
-        observations += ob.get_projected_gravity(state)
-        observations += self._context.velocity_cmd
+        base_r_odom = ob.get_base_rotation(state)
+        ob.get_base_linear_velocity(state, base_r_odom, self._obs_base_linear_velocity)
+        ob.get_base_angular_velocity(state, base_r_odom, self._obs_base_angular_velocity)
+        ob.get_projected_gravity(state, base_r_odom, self._obs_projected_gravity)
+        self._obs_velocity_cmd[:] = self._context.velocity_cmd
         if self.verbose:
             print("[INFO] cmd", self._context.velocity_cmd)
-        observations += ob.get_joint_positions(state, config)
-        observations += ob.get_joint_velocity(state)
-        observations += self._last_action
+
+        # read the leg joints out of the proto in one pass rather than indexing it per joint
+        joint_positions = np.fromiter(state.joint_states.position, dtype=np.float64, count=12)
+        joint_velocities = np.fromiter(state.joint_states.velocity, dtype=np.float64, count=12)
+        ob.get_joint_positions(joint_positions, config, self._obs_joint_positions)
+        ob.get_joint_velocity(joint_velocities, self._obs_joint_velocity)
+
+        # last action was written into the buffer when the previous command was generated
+        observations = self._obs[0]
         return observations
 
-    def create_proto(self, pos_command: List[float]):
-        """generate a proto msg for spot with a given pos_command
+    def create_proto(self, pos_command: np.ndarray, state: RobotStateStreamResponse):
+        """generate a proto msg for spot with a given pos_command. the same message is
+        reused for every call so it must be sent before this is called again
 
         arguments
-        pos_command -- list of joint positions see spot.constants for order
+        pos_command -- array of joint positions see spot.constants for order
+        state -- proto msg with the state pos_command was computed from
 
         return proto message to send in spots command stream
         """
-        update_proto = robot_command_pb2.JointControlStreamRequest()
+        update_proto = self._update_proto
         set_timestamp_from_now(update_proto.header.request_timestamp)
-        update_proto.header.client_name = "rl_example_client"
-
-        k_q_p = dict_to_list(self._config.kp, ordered_joint_names_bosdyn)
-        k_qd_p = dict_to_list(self._config.kd, ordered_joint_names_bosdyn)
-
-        N_DOF = len(pos_command)
-        pos_cmd = [0] * N_DOF
-        vel_cmd = [0] * N_DOF
-        load_cmd = [0] * N_DOF
-
-        for joint_ind in range(N_DOF):
-            pos_cmd[joint_ind] = pos_command[joint_ind]
-            vel_cmd[joint_ind] = 0
-            load_cmd[joint_ind] = 0
 
         # Fill in gains the first dt
         if self._count == 1:
-            update_proto.joint_command.gains.k_q_p.extend(k_q_p)
-            update_proto.joint_command.gains.k_qd_p.extend(k_qd_p)
+            update_proto.joint_command.gains.k_q_p.extend(self._config.kp_bosdyn)
+            update_proto.joint_command.gains.k_qd_p.extend(self._config.kd_bosdyn)
+        elif update_proto.joint_command.HasField("gains"):
+            update_proto.joint_command.ClearField("gains")
 
-        update_proto.joint_command.position.extend(pos_cmd)
-        update_proto.joint_command.velocity.extend(vel_cmd)
-        update_proto.joint_command.load.extend(load_cmd)
+        # velocity and load stay at the zeros set in _create_stream_request
+        # convert to python floats only here where the values enter the proto
+        update_proto.joint_command.position[:] = pos_command.tolist()
 
-        observation_time = self._context.latest_state.joint_states.acquisition_timestamp
+        observation_time = state.joint_states.acquisition_timestamp
         end_time = seconds_to_timestamp(timestamp_to_sec(observation_time) + 0.1)
         update_proto.joint_command.end_time.CopyFrom(end_time)
 
-        # Let it extrapolate the command a little
-        update_proto.joint_command.extrapolation_duration.nanos = int(5 * 1e6)
-
         # Set user key for latency tracking
         update_proto.joint_command.user_command_key = self._count
         return update_proto
 
     def create_proto_hold(self):
-        """generate a proto msg that holds spots current pose useful for debugging
+        """generate a proto msg that holds spots current pose useful for debugging. the same
+        message is reused for every call so it must be sent before this is called again
 
         return proto message to send in spots command stream
         """
-        update_proto = robot_command_pb2.JointControlStreamRequest()
-        update_proto.Clear()
+        update_proto = self._hold_proto
         set_timestamp_from_now(update_proto.header.request_timestamp)
-        update_proto.header.client_name = "rl_example_client"
-
-        k_q_p = DEFAULT_K_Q_P[0:12]
-        k_qd_p = DEFAULT_K_QD_P[0:12]
-
-        N_DOF = 12
-        pos_cmd = [0] * N_DOF
-        vel_cmd = [0] * N_DOF
-        load_cmd = [0] * N_DOF
-
-        for joint_ind in range(N_DOF):
-            pos_cmd[joint_ind] = self._init_pos[joint_ind]
-            vel_cmd[joint_ind] = 0
-            load_cmd[joint_ind] = self._init_load[joint_ind]
 
         # Fill in gains the first dt
         if self._count == 1:
-            update_proto.joint_command.gains.k_q_p.extend(k_q_p)
-            update_proto.joint_command.gains.k_qd_p.extend(k_qd_p)
+            update_proto.joint_command.gains.k_q_p.extend(DEFAULT_K_Q_P[0:12])
+            update_proto.joint_command.gains.k_qd_p.extend(DEFAULT_K_QD_P[0:12])
+        elif update_proto.joint_command.HasField("gains"):
+            update_proto.joint_command.ClearField("gains")
 
-        update_proto.joint_command.position.extend(pos_cmd)
-        update_proto.joint_command.velocity.extend(vel_cmd)
-        update_proto.joint_command.load.extend(load_cmd)
+        update_proto.joint_command.position[:] = self._init_pos
+        update_proto.joint_command.load[:] = self._init_load
 
         observation_time = self._context.latest_state.joint_states.acquisition_timestamp
         end_time = seconds_to_timestamp(timestamp_to_sec(observation_time) + 0.1)
         update_proto.joint_command.end_time.CopyFrom(end_time)
 
-        # Let it extrapolate the command a little
-        update_proto.joint_command.extrapolation_duration.nanos = int(5 * 1e6)
-
         # Set user key for latency tracking
         update_proto.joint_command.user_command_key = self._count
         return update_proto
+
+    def _create_stream_request(self):
+        """allocate a joint command message with the fields that never change filled in
+
+        return proto message to be updated and sent in spots command stream
+        """
+        update_proto = robot_command_pb2.JointControlStreamRequest()
+        update_proto.header.client_name = "rl_example_client"
+
+        update_proto.joint_command.position.extend(_ZERO_JOINTS)
+        update_proto.joint_command.velocity.extend(_ZERO_JOINTS)
+        update_proto.joint_command.load.extend(_ZERO_JOINTS)
+
+        # Let it extrapolate the command a little
+        update_proto.joint_command.extrapolation_duration.nanos = int(5 * 1e6)
+        return update_proto
@@ -6,8 +6,11 @@ import re
 from dataclasses import dataclass
 from typing import List
 
+import numpy as np
 from orbit.orbit_constants import ordered_joint_names_orbit
-from utils.dict_tools import dict_from_lists, set_matching
+from orbit.policy_quantization import QUANTIZED_POLICY_SUFFIX
+from spot.constants import ordered_joint_names_bosdyn
+from utils.dict_tools import MatchingKeySelector, dict_from_lists, dict_to_array, dict_to_list
 
 
 @dataclass
@@ -20,6 +23,11 @@ class OrbitConfig:
     standing_height: float
     action_scale: float
 
+    # values above pre-ordered for the control loop so they are not looked up every tick
+    kp_bosdyn: List[float]  # kp in spot joint order
+    kd_bosdyn: List[float]  # kd in spot joint order
+    default_joints_orbit: np.ndarray  # default joint positions in orbit joint order
+
 
 def detect_config_file(directory: os.PathLike) -> os.PathLike:
     """find json file in policy directory
@@ -38,14 +46,15 @@ def detect_config_file(directory: os.PathLike) -> os.PathLike:
 
 
 def detect_policy_file(directory: os.PathLike) -> os.PathLike:
-    """find onnx file in policy directory
+    """find onnx file in policy directory, quantized copies made by
+    orbit.policy_quantization are ignored
 
     arguments
     directory -- path where policy and training configuration can be found
 
     return filepath to onnx file
     """
-    files = [f for f in os.listdir(directory) if f.endswith(".onnx")]
+    files = [f for f in os.listdir(directory) if f.endswith(".onnx") and not f.endswith(QUANTIZED_POLICY_SUFFIX)]
     if len(files) == 1:
         return os.path.join(directory, files[0])
     return None
@@ -66,18 +75,26 @@ def load_configuration(file: os.PathLike) -> OrbitConfig:
 
     with open(file) as f:
         env_config = json.load(f)
+
+        # match each actuator expression against the joint names once and reuse the selection
+        # for both stiffness and damping
         actuators = env_config["scene"]["robot"]["actuators"]
         for group in actuators.keys():
             regex = re.compile(actuators[group]["joint_names_expr"][0])
+            selector = MatchingKeySelector(ordered_joint_names_orbit, regex)
 
-            set_matching(joint_kp, regex, actuators[group]["stiffness"])
-            set_matching(joint_kd, regex, actuators[group]["damping"])
+            selector.apply(joint_kp, actuators[group]["stiffness"])
+            selector.apply(joint_kd, actuators[group]["damping"])
 
+        # compile every default joint expression once then match each joint name against them in a
+        # single sweep, later expressions take precedence as they did when applied one by one
         default_joint_data = env_config["scene"]["robot"]["init_state"]["joint_pos"]
-        default_joint_expressions = default_joint_data.keys()
-        for expression in default_joint_expressions:
-            regex = re.compile(expression)
-            set_matching(joint_offsets, regex, default_joint_data[expression])
+        offset_patterns = [(re.compile(expression), value) for expression, value in default_joint_data.items()]
+
+        for joint in ordered_joint_names_orbit:
+            for regex, value in offset_patterns:
+                if regex.match(joint):
+                    joint_offsets[joint] = value
 
         action_scale = env_config["actions"]["joint_pos"]["scale"]
         standing_height = env_config["scene"]["robot"]["init_state"]["pos"][2]
@@ -88,4 +105,7 @@ def load_configuration(file: os.PathLike) -> OrbitConfig:
         default_joints=joint_offsets,
         standing_height=standing_height,
         action_scale=action_scale,
+        kp_bosdyn=dict_to_list(joint_kp, ordered_joint_names_bosdyn),
+        kd_bosdyn=dict_to_list(joint_kd, ordered_joint_names_bosdyn),
+        default_joints_orbit=dict_to_array(joint_offsets, ordered_joint_names_orbit),
     )
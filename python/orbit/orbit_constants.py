@@ -2,6 +2,10 @@
 
 """spots base joints in order expected/used by orbit libraries"""
 
+import numpy as np
+from spot.constants import ordered_joint_names_bosdyn
+from utils.dict_tools import find_ordering
+
 ordered_joint_names_orbit = [
     "fl_hx",
     "fr_hx",
@@ -16,3 +20,11 @@ ordered_joint_names_orbit = [
     "hl_kn",
     "hr_kn",
 ]
+
+# joint orderings are fixed so the index arrays mapping between them only need to be computed once
+spot_to_orbit_ordering = np.asarray(
+    find_ordering(ordered_joint_names_bosdyn, ordered_joint_names_orbit), dtype=np.int64
+)
+orbit_to_spot_ordering = np.asarray(
+    find_ordering(ordered_joint_names_orbit, ordered_joint_names_bosdyn), dtype=np.int64
+)
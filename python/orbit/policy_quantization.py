@@ -0,0 +1,42 @@
+# Copyright (c) 2024 Boston Dynamics AI Institute LLC. All rights reserved.
+
+import os
+
+QUANTIZED_POLICY_SUFFIX = ".int8.onnx"
+
+
+def quantized_policy_path(policy_file: os.PathLike) -> os.PathLike:
+    """path the int8 copy of a policy is stored at, next to the original
+
+    arguments
+    policy_file -- path to the float32 onnx policy
+
+    return filepath of the quantized policy
+    """
+    root, _ = os.path.splitext(policy_file)
+    return root + QUANTIZED_POLICY_SUFFIX
+
+
+def quantize_policy(policy_file: os.PathLike) -> os.PathLike:
+    """create an int8 dynamically quantized copy of the policy unless one newer than the policy exists
+        weights are stored as int8 while the model input and output stay float32 so the
+        quantized policy is a drop in replacement.  check the actions stay within tolerance
+        of the original on a validation rollout before running it on the robot
+
+    arguments
+    policy_file -- path to the float32 onnx policy
+
+    return filepath to the quantized policy
+    """
+    quantized_file = quantized_policy_path(policy_file)
+    # reuse an existing copy only if it was made after the policy was last written, otherwise a
+    # replaced policy would silently keep running the quantized copy of the old one
+    if os.path.exists(quantized_file) and os.path.getmtime(quantized_file) >= os.path.getmtime(policy_file):
+        return quantized_file
+
+    # only needed for this offline step so avoid importing it unless asked to quantize
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    print(f"[INFO] quantizing {policy_file} to {quantized_file}")
+    quantize_dynamic(policy_file, quantized_file, weight_type=QuantType.QInt8)
+    return quantized_file
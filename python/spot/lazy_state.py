@@ -0,0 +1,31 @@
+# Copyright (c) 2024 Boston Dynamics AI Institute LLC. All rights reserved.
+
+from bosdyn.api.robot_state_pb2 import RobotStateStreamResponse
+
+
+class LazyState:
+    """wrapper around a serialized RobotStateStreamResponse that is only parsed
+    the first time one of its fields is read.  the state stream arrives much faster
+    than the controller consumes it so most updates are replaced before being read
+    and never need to be decoded
+    """
+
+    __slots__ = ("_data", "_state")
+
+    def __init__(self, data: bytes) -> None:
+        """
+        arguments
+        data -- RobotStateStreamResponse in protobuf wire format
+        """
+        self._data = data
+        self._state = None
+
+    def __getattr__(self, name: str):
+        """parse the message on first access and forward attribute lookups to it
+
+        arguments
+        name -- name of the RobotStateStreamResponse field being read
+        """
+        if self._state is None:
+            self._state = RobotStateStreamResponse.FromString(self._data)
+        return getattr(self._state, name)
@@ -1,53 +1,67 @@
 # Copyright (c) 2024 Boston Dynamics AI Institute LLC. All rights reserved.
 
-import math
 import time
 from contextlib import nullcontext
-from threading import Thread
+from threading import Event, Thread
 from typing import Any, Callable, List
 
 from bosdyn.api.robot_command_pb2 import JointControlStreamRequest
 from bosdyn.api.robot_state_pb2 import RobotStateStreamResponse
+from spot.lazy_state import LazyState
 
 
 class RepeatedTimer(Thread):
     def __init__(self, dt_seconds: float, target: Callable, args: List[Any] = []) -> None:
         super().__init__()
         self._dt_seconds = dt_seconds
+        self._dt_ns = int(dt_seconds * 1e9)
         self._target = target
         self._args = args
-        self._stopping = False
+        self._stop_event = Event()
 
     def run(self):
-        run_time = time.monotonic()
-        while not self._stopping:
-            now = time.monotonic()
-            num_dt = math.ceil((now - run_time) / self._dt_seconds)
-            run_time += num_dt * self._dt_seconds
-            time.sleep(run_time - now)
+        deadline = time.monotonic_ns()
+        while not self._stop_event.is_set():
+            now = time.monotonic_ns()
+            if deadline > now and self._stop_event.wait((deadline - now) / 1e9):
+                return
             self._target(*self._args)
 
+            # schedule against absolute deadlines, skipping any ticks missed by a slow target
+            deadline += self._dt_ns
+            now = time.monotonic_ns()
+            if deadline <= now:
+                deadline += ((now - deadline) // self._dt_ns + 1) * self._dt_ns
+
     def stop(self):
-        self._stopping = True
+        self._stop_event.set()
 
 
 class MockSpot:
     def __init__(self):
-        self._state_stream_stopping = False
-        self._command_stream_stopping = False
+        self._command_stream_stop = Event()
+        self._stateUpdates = None
+        self._command_thread = None
 
-    def start_state_stream(self, on_state_update: Callable[[RobotStateStreamResponse], None]):
+    def start_state_stream(self, on_state_update: Callable[[RobotStateStreamResponse], None], raw: bool = False):
         self._state_msg = RobotStateStreamResponse()
         self._state_msg.kinematic_state.odom_tform_body.rotation.w = 1
         self._state_msg.joint_states.position.extend([0] * 12)
         self._state_msg.joint_states.velocity.extend([0] * 12)
         self._state_msg.joint_states.load.extend([0] * 12)
 
-        self._stateUpdates = RepeatedTimer(1 / 333, on_state_update, args=[self._state_msg])
+        if raw:
+            data = self._state_msg.SerializeToString()
+            self._stateUpdates = RepeatedTimer(1 / 333, lambda: on_state_update(LazyState(data)))
+        else:
+            self._stateUpdates = RepeatedTimer(1 / 333, on_state_update, args=[self._state_msg])
         self._stateUpdates.start()
 
     def start_command_stream(
-        self, command_policy: Callable[[None], JointControlStreamRequest], timing_policy: Callable[[None], None]
+        self,
+        command_policy: Callable[[None], JointControlStreamRequest],
+        timing_policy: Callable[[None], None],
+        realtime: bool = False,
     ):
         self._timing_policy = timing_policy
         self._command_generator = command_policy
@@ -59,7 +73,7 @@ class MockSpot:
         return nullcontext()
 
     def _commandUpdate(self):
-        while not self._command_stream_stopping:
+        while not self._command_stream_stop.is_set():
             self._timing_policy()
             self._command_generator()
 
@@ -76,5 +90,5 @@ class MockSpot:
 
     def stop_command_stream(self):
         if self._command_thread is not None:
-            self._command_stream_stopping = True
+            self._command_stream_stop.set()
             self._command_thread.join()
@@ -1,7 +1,7 @@
 # Copyright (c) 2024 Boston Dynamics AI Institute LLC. All rights reserved.
 
-import time
-from threading import Thread
+import os
+from threading import Event, Thread
 from typing import Callable
 
 import bosdyn.client
@@ -9,7 +9,7 @@ import bosdyn.client.lease
 import bosdyn.client.util
 from bosdyn import geometry
 from bosdyn.api.robot_command_pb2 import JointControlStreamRequest
-from bosdyn.api.robot_state_pb2 import RobotStateStreamResponse
+from bosdyn.api.robot_state_pb2 import RobotStateStreamRequest, RobotStateStreamResponse
 from bosdyn.client.robot_command import (
     RobotCommandBuilder,
     RobotCommandClient,
@@ -17,6 +17,18 @@ from bosdyn.client.robot_command import (
     blocking_stand,
 )
 from bosdyn.client.robot_state import RobotStateStreamingClient
+from spot.lazy_state import LazyState
+
+# full name of the state stream rpc, used to open the stream without a response deserializer
+_STATE_STREAM_METHOD = "/bosdyn.api.RobotStateStreamingService/GetRobotStateStream"
+
+# keepalive settings for the channel carrying the state and command streams so a dead connection is
+# noticed within seconds instead of stalling the streams until tcp gives up
+_STREAMING_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 10000),
+    ("grpc.keepalive_timeout_ms", 5000),
+    ("grpc.http2.max_pings_without_data", 0),
+]
 
 
 class Spot:
@@ -29,7 +41,7 @@ class Spot:
         config -- arguments for connecting to spot must contain hostname
         """
 
-        self._started_streaming = False
+        self._streaming_started = Event()
         self._activate_thread_stopping = False
         self._command_stream_stopping = False
         self._state_stream_stopping = False
@@ -45,10 +57,20 @@ class Spot:
         self.sdk.register_service_client(RobotCommandStreamingClient)
         self.sdk.register_service_client(RobotStateStreamingClient)
         self.robot = self.sdk.create_robot(config.hostname)
+
+        # the sdk caches one channel per authority and the directory shares its authority with the
+        # streaming services, create it here so both streams multiplex over one connection with keepalive
+        self.robot.ensure_channel("directory", options=list(_STREAMING_CHANNEL_OPTIONS))
+
         bosdyn.client.util.authenticate(self.robot)
         self.robot.time_sync.wait_for_sync()
         assert not self.robot.is_estopped(), "Robot is estopped. Please use an external E-Stop client."
 
+        # look up the clients once, activate and the stream threads would otherwise each create them
+        self._command_client = self.robot.ensure_client(RobotCommandClient.default_service_name)
+        self._command_streaming_client = self.robot.ensure_client(RobotCommandStreamingClient.default_service_name)
+        self.robot_state_streaming_client = self.robot.ensure_client(RobotStateStreamingClient.default_service_name)
+
     def __del__(self):
         """clean up active streams and threads if spot goes out of scope or is deleted"""
         self.stop_command_stream()
@@ -78,21 +100,20 @@ class Spot:
         body_height -- controls height of standing as delta from default or 0.525m
 
         """
-        self._command_client = self.robot.ensure_client(RobotCommandClient.default_service_name)
         # Stand the robot
         params = RobotCommandBuilder.mobility_params(body_height, footprint_R_body=geometry.EulerZXY())
 
         blocking_stand(self._command_client, 10, 1.0, params)
 
-    def start_state_stream(self, on_state_update: Callable[[RobotStateStreamResponse], None]):
+    def start_state_stream(self, on_state_update: Callable[[RobotStateStreamResponse], None], raw: bool = False):
         """The robot state streaming client will allow us to get the robot's joint and imu information.
 
         arguments
         on_state_update -- Callable that will be called at ~333Hz with latest state data
+        raw -- if true on_state_update is given a LazyState that is only parsed when it is read
 
         """
-        self.robot_state_streaming_client = self.robot.ensure_client(RobotStateStreamingClient.default_service_name)
-        self._state_thread = Thread(target=self._handle_state_stream, args=[on_state_update])
+        self._state_thread = Thread(target=self._handle_state_stream, args=[on_state_update, raw])
         self._state_thread.start()
 
     def stop_state_stream(self):
@@ -102,23 +123,29 @@ class Spot:
             self._state_thread.join()
 
     def start_command_stream(
-        self, command_policy: Callable[[None], JointControlStreamRequest], timing_policy: Callable[[None], None]
+        self,
+        command_policy: Callable[[None], JointControlStreamRequest],
+        timing_policy: Callable[[None], None],
+        realtime: bool = False,
     ):
         """create command streamt to send joint level commands to spot
 
             command stream will repeatedly call timing_policy to block until a command should be sent
-            and then call command_policy to create one command
+            and then call command_policy to create one command. command_policy may return the same
+            message every call and update it in place, each command is serialized before the next
+            one is requested
 
         arguments
         command_policy -- Callable that will create one joint command
         timing_policy -- Callable that blocks until the next time a command should be generated
+        realtime -- run the command loop with SCHED_FIFO priority, needs linux and CAP_SYS_NICE
 
         """
         # Async activate once streaming has started
         self._activate_thread = Thread(target=self.activate)
         self._activate_thread.start()
 
-        self._command_thread = Thread(target=self._run_command_stream, args=[command_policy, timing_policy])
+        self._command_thread = Thread(target=self._run_command_stream, args=[command_policy, timing_policy, realtime])
         self._command_thread.start()
 
     def stop_command_stream(self):
@@ -129,23 +156,41 @@ class Spot:
 
         if self._activate_thread is not None:
             self._activate_thread_stopping = True
+            self._streaming_started.set()  # wake activate so it sees the stop flag
             self._activate_thread.join()
 
-    def _handle_state_stream(self, on_state_update: Callable[[RobotStateStreamResponse], None]):
+    def _handle_state_stream(self, on_state_update: Callable[[RobotStateStreamResponse], None], raw: bool):
         """private function to be run in state stream thread
             listens for state steam events and calls users callback
 
         arguments
         on_state_update -- callback supplied to start_state_stream
+        raw -- pass updates to the callback as LazyState instead of parsing every message
         """
-        for state in self.robot_state_streaming_client.get_robot_state_stream():
-            on_state_update(state)
+        if raw:
+            # same rpc the streaming client uses but the messages are left as bytes
+            get_state_stream = self.robot_state_streaming_client.channel.unary_stream(
+                _STATE_STREAM_METHOD,
+                request_serializer=RobotStateStreamRequest.SerializeToString,
+                response_deserializer=None,
+            )
+            for data in get_state_stream(RobotStateStreamRequest()):
+                on_state_update(LazyState(data))
 
-            if self._state_stream_stopping:
-                return
+                if self._state_stream_stopping:
+                    return
+        else:
+            for state in self.robot_state_streaming_client.get_robot_state_stream():
+                on_state_update(state)
+
+                if self._state_stream_stopping:
+                    return
 
     def _run_command_stream(
-        self, command_policy: Callable[[None], JointControlStreamRequest], timing_policy: Callable[[None], None]
+        self,
+        command_policy: Callable[[None], JointControlStreamRequest],
+        timing_policy: Callable[[None], None],
+        realtime: bool,
     ):
         """private function to be run in command stream thread handles opening grpc
             stream
@@ -153,18 +198,18 @@ class Spot:
         arguments
         command_policy -- callback supplied to start_command_stream to create commands
         timing_policy -- callback supplied to start_command_stream to control timing
+        realtime -- run the command loop with SCHED_FIFO priority
         """
 
-        self._command_streaming_client = self.robot.ensure_client(RobotCommandStreamingClient.default_service_name)
-
         try:
             self.robot.logger.info("Starting command stream")
             res = self._command_streaming_client.send_joint_control_commands(
-                self._command_stream_loop(command_policy, timing_policy)
+                self._command_stream_loop(command_policy, timing_policy, realtime)
             )
             print(res)
         finally:
             self._activate_thread_stopping = True
+            self._streaming_started.set()  # wake activate so it sees the stop flag
 
             if self._activate_thread:
                 self._activate_thread.join()
@@ -176,35 +221,55 @@ class Spot:
         self.robot.logger.info("Robot safely powered off.")
 
     def _command_stream_loop(
-        self, command_policy: Callable[[None], JointControlStreamRequest], timing_policy: Callable[[None], None]
+        self,
+        command_policy: Callable[[None], JointControlStreamRequest],
+        timing_policy: Callable[[None], None],
+        realtime: bool,
     ):
         """coroutine needed for command stream. repeatedly calls timing_policty
-        to block until next dt and then yields the result of command_policy once
+        to block until next dt and then yields the result of command_policy once.
+        grpc serializes each yielded message before asking for the next so
+        command_policy is free to reuse a single message
 
         arguments
         command_policy -- callback supplied to start_command_stream to create commands
         timing_policy -- callback supplied to start_command_stream to control timing
+        realtime -- run the command loop with SCHED_FIFO priority
         """
 
+        # grpc consumes this generator on its own thread so the priority is raised from inside it
+        if realtime:
+            self._set_realtime()
+
         while not self._command_stream_stopping:
             if timing_policy():
                 yield command_policy()
-                self._started_streaming = True
+                self._streaming_started.set()
             else:
                 print("timing policy timeout")
                 return
         print("stopping is True")
 
-    # Method to activate full body joint control through RobotCommand
-    def activate(self):
-        self._command_client = self.robot.ensure_client(RobotCommandClient.default_service_name)
+    def _set_realtime(self, priority: int = 80):
+        """switch the calling thread to the SCHED_FIFO realtime scheduling policy
+            so the control loop is not preempted by ordinary processes. failure is
+            logged and the thread keeps its normal priority
 
-        # Wait for streaming to start
-        while not self._started_streaming:
-            time.sleep(0.001)
+        arguments
+        priority -- SCHED_FIFO priority between 1 and 99
+        """
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        except (AttributeError, PermissionError) as e:
+            # AttributeError when not on linux, PermissionError without CAP_SYS_NICE
+            self.robot.logger.warning(f"Could not set realtime priority: {e}")
 
-            if self._activate_thread_stopping:
-                return
+    # Method to activate full body joint control through RobotCommand
+    def activate(self):
+        # Wait for streaming to start, also released if the stream is stopped before it starts
+        self._streaming_started.wait()
+        if self._activate_thread_stopping:
+            return
 
         # Activate joint control
         self.robot.logger.info("Activating joint control")
@@ -17,6 +17,7 @@ from orbit.onnx_command_generator import (
     OnnxControllerContext,
     StateHandler,
 )
+from orbit.policy_quantization import quantize_policy
 from spot.mock_spot import MockSpot
 from spot.spot import Spot
 from utils.event_divider import EventDivider
@@ -29,22 +30,28 @@ def main():
     parser.add_argument("policy_file_path", type=Path)
     parser.add_argument("-m", "--mock", action="store_true")
     parser.add_argument("--gamepad-config", type=Path)
+    parser.add_argument("-q", "--quantize", action="store_true", help="run an int8 quantized copy of the policy")
+    parser.add_argument(
+        "--realtime", action="store_true", help="run the command loop with SCHED_FIFO priority, needs CAP_SYS_NICE"
+    )
     options = parser.parse_args()
 
     conf_file = orbit.orbit_configuration.detect_config_file(options.policy_file_path)
     policy_file = orbit.orbit_configuration.detect_policy_file(options.policy_file_path)
+    if options.quantize:
+        policy_file = quantize_policy(policy_file)
 
     context = OnnxControllerContext()
     config = orbit.orbit_configuration.load_configuration(conf_file)
     print(config)
 
-    state_handler = StateHandler(context)
+    # 333 Hz state update / 6 => ~56 Hz control updates
+    timeing_policy = EventDivider(6)
+
+    state_handler = StateHandler(context, timeing_policy)
     print(options.verbose)
     command_generator = OnnxCommandGenerator(context, config, policy_file, options.verbose)
 
-    # 333 Hz state update / 6 => ~56 Hz control updates
-    timeing_policy = EventDivider(context.event, 6)
-
     gamepad = None
     if joystick_connected():
         if options.gamepad_config is not None:
@@ -66,10 +73,10 @@ def main():
         try:
             spot.power_on()
             spot.stand(0.0)
-            spot.start_state_stream(state_handler)
+            spot.start_state_stream(state_handler, raw=True)
 
             input()
-            spot.start_command_stream(command_generator, timeing_policy)
+            spot.start_command_stream(command_generator, timeing_policy, options.realtime)
             input()
 
         except KeyboardInterrupt:
@@ -1,6 +1,8 @@
 # Copyright (c) 2024 Boston Dynamics AI Institute LLC. All rights reserved.
 
-from typing import Any, List
+from typing import Any, Iterable, List
+
+import numpy as np
 
 
 def dict_from_lists(keys: List, values: List):
@@ -28,16 +30,39 @@ def dict_to_list(data: dict, keys: List):
     return [data.get(key) for key in keys]
 
 
-def set_matching(data: dict, regex, value):
-    """set values in dict with keys matching regex
+def dict_to_array(data: dict, keys: List, dtype=np.float64) -> np.ndarray:
+    """construct a numpy array of values from dictionary in the order specified by keys
 
     arguments
-    dict -- dictionary to set keys in
-    regex -- regex to select keys that will be set
-    value -- value to set keys matching regex to
+    data -- dictionary to look up keys in
+    keys -- list of keys to retrieve in order
+    dtype -- numpy type of the returned array
+
+    return array of values from dict in same order as keys
     """
-    for key in data:
-        if regex.match(key):
+    return np.fromiter((data.get(key) for key in keys), dtype=dtype, count=len(keys))
+
+
+class MatchingKeySelector:
+    """set of keys matching a regex, computed once so values can be set on those keys
+    repeatedly without running the regex again"""
+
+    def __init__(self, keys: Iterable, regex) -> None:
+        """
+        arguments
+        keys -- candidate keys e.g. the keys of the dicts the selector will be applied to
+        regex -- compiled regex to select keys
+        """
+        self.keys = frozenset(key for key in keys if regex.match(key))
+
+    def apply(self, data: dict, value):
+        """set values in dict for the selected keys
+
+        arguments
+        data -- dictionary to set keys in
+        value -- value to set the selected keys to
+        """
+        for key in self.keys:
             data[key] = value
 
 
@@ -53,6 +78,19 @@ def reorder(inputs: List[Any], ordering: List[int]) -> List[Any]:
     return [inputs[i] for i in ordering]
 
 
+def reorder_np(inputs: np.ndarray, ordering: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """rearrange values in an array to a given order with a single gather.
+
+    arguments
+    inputs -- array of values
+    ordering -- integer array of indices into inputs in desired order, see find_ordering
+    out -- optional array to write the result into instead of allocating one
+
+    return array of values in new order
+    """
+    return np.take(inputs, ordering, out=out)
+
+
 def find_ordering(input: List[Any], output: List[Any]) -> List[int]:
     """given two lists containing the same values return a list of indices mapping input->output
 
@@ -62,4 +100,6 @@ def find_ordering(input: List[Any], output: List[Any]) -> List[int]:
 
     return list such that the nth value is the index of output[n] in the input list
     """
-    return [input.index(key) for key in output]
+    # built in reverse so repeated values map to their first index like list.index
+    index = {value: i for i, value in reversed(list(enumerate(input)))}
+    return [index[key] for key in output]
@@ -2,13 +2,33 @@ import json
 import os
 import yaml
 
+# env.yaml contains python object tags (e.g. slices) so the full loader is needed, prefer the libyaml backed one
+try:
+    from yaml import CLoader as Loader
+except ImportError:
+    from yaml import Loader
+
+# orjson is optional, the stdlib encoder is used when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 def remove_slice(dictionary):
-    for key, value in dictionary.items():
-        if type(value) is dict:
-            remove_slice(value)
-        else:
-            if "slice" in str(value):  
-              dictionary[key] = None
+    stack = [dictionary]
+    while stack:
+        current = stack.pop()
+        for key, value in current.items():
+            if isinstance(value, dict):
+                stack.append(value)
+            elif isinstance(value, (bool, int, float)) or value is None:
+                # plain numeric leaves can never mention a slice, skip formatting them
+                continue
+            elif isinstance(value, str):
+                if "slice" in value:
+                    current[key] = None
+            elif "slice" in str(value):
+                current[key] = None
     return dictionary
 
 
@@ -16,7 +36,7 @@ def load_local_cfg(resume_path: str) -> dict:
     env_cfg_yaml_path = os.path.join(cfg_dir, "env.yaml")
     # load yaml
     with open(env_cfg_yaml_path) as yaml_in:
-        env_cfg = yaml.load(yaml_in, Loader=yaml.Loader)
+        env_cfg = yaml.load(yaml_in, Loader=Loader)
 
     env_cfg = remove_slice(env_cfg)
     return env_cfg
@@ -26,5 +46,9 @@ cfg_dir = input()
 env_cfg = load_local_cfg(cfg_dir)
 
 cfg_save_path = os.path.join(cfg_dir, "env_cfg.json")
-with open(cfg_save_path, "w") as fp:
-    json.dump(env_cfg, fp, indent=4)
\ No newline at end of file
+if orjson is not None:
+    with open(cfg_save_path, "wb") as fp:
+        fp.write(orjson.dumps(env_cfg, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+else:
+    with open(cfg_save_path, "w") as fp:
+        json.dump(env_cfg, fp, indent=4)
\ No newline at end of file
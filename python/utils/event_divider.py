@@ -1,23 +1,36 @@
 # Copyright (c) 2024 Boston Dynamics AI Institute LLC. All rights reserved.
 
-import time
-from threading import Event
+from threading import Condition
 
 
 class EventDivider:
-    def __init__(self, event: Event, factor: int):
-        self._event = event
+    """timing policy that releases the command stream once for every factor calls to tick"""
+
+    def __init__(self, factor: int):
+        """
+        arguments
+        factor -- number of ticks between each release of the command stream
+        """
         self._factor = factor
+        self._count = 0
+        self._cond = Condition()
+
+    def tick(self):
+        """count one event, to be called by the producer e.g. for every state update"""
+        with self._cond:
+            self._count += 1
+            if self._count >= self._factor:
+                self._cond.notify()
 
     def __call__(self):
-        count = 0
+        """block until factor ticks have been counted since the last release
 
-        while count < self._factor:
-            if not self._event.wait(1):
+        return False if the ticks stopped arriving, True otherwise
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._count >= self._factor, timeout=1):
                 return False
 
-            count += 1
-            self._event.clear()
-            time.sleep(0.001)
-
-        return True
+            # keep any ticks counted towards the next release but drop whole periods that were missed
+            self._count %= self._factor
+            return True
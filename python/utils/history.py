@@ -6,8 +6,23 @@ import numpy
 class History:
     """Convenience class to record past values of an array of data and calculate statistics on it"""
 
-    def __init__(self) -> None:
-        self._data = []
+    # number of rows allocated on the first record, the table doubles in size whenever it fills up
+    _INITIAL_CAPACITY = 1024
+
+    def __init__(self, dtype=numpy.float16) -> None:
+        """
+        arguments
+        dtype -- numpy type the history is stored as, half precision by default to keep long histories
+                 small. float16 keeps only 11 significant bits, so values are rounded to about 3 significant
+                 digits (e.g. 3997 is stored as 3996 and 3999 as 4000) and magnitudes above 65504 are
+                 stored as inf, which makes standard_deviation nan. that is enough for joint positions,
+                 velocities and loads, pass numpy.float32 or numpy.float64 for anything else
+        """
+        self._dtype = dtype
+        # reductions are accumulated in at least single precision regardless of the storage type
+        self._reduce_dtype = numpy.promote_types(dtype, numpy.float32)
+        self._data = None
+        self._size = 0
 
     def record(self, datum):
         """adds a new data entry to the history. i.e. adds a row to the history table
@@ -15,16 +30,28 @@ class History:
         arguments
         datum -- list of new values to store
         """
-        self._data.append(datum)
+        if self._data is None:
+            self._data = numpy.empty((self._INITIAL_CAPACITY, len(datum)), dtype=self._dtype)
+        elif self._size == len(self._data):
+            grown = numpy.empty((2 * len(self._data), self._data.shape[1]), dtype=self._dtype)
+            grown[: self._size] = self._data
+            self._data = grown
+
+        self._data[self._size] = datum
+        self._size += 1
 
     def data(self, index):
-        """return the list values for a single piece of data in each entry.
+        """return the values for a single piece of data in each entry.
             i.e. return one column of the history table
 
         arguments
         index -- position of desired data in each data entry
+
+        return array view of the column, entries recorded later are not included
         """
-        return [row[index] for row in self._data]
+        if self._data is None:
+            return numpy.empty(0, dtype=self._dtype)
+        return self._data[: self._size, index]
 
     @property
     def mean(self):
@@ -32,7 +59,7 @@ class History:
 
         return List containing the mean value of each column
         """
-        return numpy.mean(self._data, axis=0)
+        return self._rows.mean(axis=0, dtype=self._reduce_dtype)
 
     @property
     def standard_deviation(self):
@@ -40,4 +67,11 @@ class History:
 
         return List containing the standard deviations of each column
         """
-        return numpy.std(self._data, axis=0)
+        return self._rows.std(axis=0, dtype=self._reduce_dtype)
+
+    @property
+    def _rows(self):
+        """the recorded part of the history table"""
+        if self._data is None:
+            return numpy.empty((0, 0), dtype=self._dtype)
+        return self._data[: self._size]
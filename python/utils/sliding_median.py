@@ -0,0 +1,42 @@
+# Copyright (c) 2024 Boston Dynamics AI Institute LLC. All rights reserved.
+
+from bisect import bisect_left, insort
+from collections import deque
+
+
+class SlidingMedian:
+    """Median of the last window_size values, updated incrementally as new values are pushed"""
+
+    def __init__(self, window_size: int, initial_value: float = 0.0) -> None:
+        """create a full window containing only initial_value
+
+        arguments
+        window_size -- number of most recent values the median is taken over
+        initial_value -- value used to fill the window before any data is pushed
+        """
+        self._window = deque([initial_value] * window_size, window_size)
+        self._sorted = [initial_value] * window_size
+
+    def push(self, value: float) -> float:
+        """add a new value to the window evicting the oldest one
+
+        arguments
+        value -- newest value
+
+        return median of the updated window
+        """
+        if len(self._window) == self._window.maxlen:
+            oldest = self._window[0]
+            del self._sorted[bisect_left(self._sorted, oldest)]
+        self._window.append(value)
+        insort(self._sorted, value)
+        return self.median
+
+    @property
+    def median(self) -> float:
+        """median of the values currently in the window, middle two are averaged for even sizes"""
+        size = len(self._sorted)
+        mid = size // 2
+        if size % 2:
+            return self._sorted[mid]
+        return (self._sorted[mid - 1] + self._sorted[mid]) / 2
@@ -23,26 +23,15 @@ def print_controller_inputs():
 
     try:
         while True:
-            pygame.event.pump()
-
-            # Print the state of each axis
-            for i in range(joystick.get_numaxes()):
-                axis_value = joystick.get_axis(i)
-                print(f"Axis {i}: {axis_value:.2f}")
-
-            # Print the state of each button
-            for i in range(joystick.get_numbuttons()):
-                button_state = joystick.get_button(i)
-                print(f"Button {i}: {button_state}")
-
-            # Print the state of each hat
-            for i in range(joystick.get_numhats()):
-                hat_state = joystick.get_hat(i)
-                print(f"Hat {i}: {hat_state}")
-
-            print("\n---\n")
-
-            pygame.time.wait(10)  # Delay to reduce console output frequency
+            # block until the controller reports a change, the timeout keeps ctrl-c responsive
+            event = pygame.event.wait(timeout=100)
+
+            if event.type == pygame.JOYAXISMOTION:
+                print(f"Axis {event.axis}: {event.value:.2f}")
+            elif event.type in (pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP):
+                print(f"Button {event.button}: {int(event.type == pygame.JOYBUTTONDOWN)}")
+            elif event.type == pygame.JOYHATMOTION:
+                print(f"Hat {event.hat}: {event.value}")
 
     except KeyboardInterrupt:
         print("Program terminated.")